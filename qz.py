@@ -1,17 +1,21 @@
+from __future__ import annotations
+
 import argparse
-import csv
+import atexit
 import datetime
 import itertools
 import os
-import re
 import sqlite3
 import sys
-import textwrap
-import uuid
 from collections.abc import Iterator, Sequence
-from contextlib import contextmanager
+from contextlib import contextmanager, suppress
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, NoReturn, Optional, Union
+
+# `typing` is only imported by type checkers, as it's comparatively slow to import
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, NoReturn, Optional, TextIO, TypeAlias, Union
 
 __version__ = "0.1.0-alpha"
 
@@ -50,133 +54,220 @@ def get_db_path() -> Path:
     return base_path.expanduser() / "qz" / "store.db"
 
 
-def _init_db(f: Path) -> sqlite3.Connection:
-    """Create database and return a connection.
+_SCHEMA_VERSION = 1
+
+# page size and WAL are persisted in the database file, so they only need to be
+# set once; neither can be changed within a transaction, and the page size only
+# applies to a new database
+_SQL_SCHEMA = """\
+PRAGMA page_size = 4096;
+PRAGMA journal_mode = WAL;
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS activities (
+  uuid     TEXT PRIMARY KEY,
+  message  TEXT,
+  project  TEXT,
+  start_dt TEXT NOT NULL,
+  stop_dt  TEXT,
+
+  CHECK (message IS NULL OR message != '')
+  CHECK (project IS NULL OR project != '')
+  CHECK (datetime(start_dt) IS NOT NULL)
+  CHECK (datetime(stop_dt) IS NOT NULL OR stop_dt IS NULL)
+  CHECK (datetime(stop_dt) > datetime(start_dt))
+) WITHOUT ROWID, STRICT;
+
+CREATE INDEX IF NOT EXISTS activities_start_stop
+ON activities(start_dt, stop_dt);
+
+CREATE INDEX IF NOT EXISTS activities_stop
+ON activities(stop_dt);
+
+CREATE UNIQUE INDEX IF NOT EXISTS stop_dt_single_null
+ON activities(stop_dt IS NULL)
+WHERE stop_dt IS NULL;
+
+DROP TRIGGER IF EXISTS validate_dates_before_insert;
+CREATE TRIGGER validate_dates_before_insert
+BEFORE INSERT ON activities
+BEGIN
+  WITH overlapping_dates AS (
+    SELECT uuid
+    FROM activities
+    WHERE start_dt BETWEEN NEW.start_dt AND NEW.stop_dt
+
+    UNION ALL
+
+    SELECT uuid
+    FROM activities
+    WHERE stop_dt >= NEW.start_dt AND +start_dt <= NEW.start_dt
+  )
+  SELECT
+    CASE
+      WHEN datetime(NEW.start_dt) > datetime('now', 'localtime')
+        THEN RAISE(ABORT, 'start_dt is in the future')
+      WHEN datetime(NEW.stop_dt) > datetime('now', 'localtime')
+        THEN RAISE(ABORT, 'stop_dt is in the future')
+      WHEN EXISTS(SELECT * FROM overlapping_dates)
+        THEN RAISE(ABORT, 'overlapping activities')
+    END;
+END;
+
+DROP TRIGGER IF EXISTS validate_dates_before_update;
+CREATE TRIGGER validate_dates_before_update
+BEFORE UPDATE ON activities
+WHEN
+  NEW.start_dt IS NOT OLD.start_dt
+  OR NEW.stop_dt IS NOT OLD.stop_dt
+BEGIN
+  WITH overlapping_dates AS (
+    SELECT uuid
+    FROM activities
+    WHERE start_dt BETWEEN NEW.start_dt AND NEW.stop_dt
+
+    UNION ALL
+
+    SELECT uuid
+    FROM activities
+    WHERE stop_dt >= NEW.start_dt AND +start_dt <= NEW.start_dt
+  )
+  SELECT
+    CASE
+      WHEN datetime(NEW.start_dt) > datetime('now', 'localtime')
+        THEN RAISE(ABORT, 'start_dt is in the future')
+      WHEN datetime(NEW.stop_dt) > datetime('now', 'localtime')
+        THEN RAISE(ABORT, 'stop_dt is in the future')
+      WHEN EXISTS(SELECT * FROM overlapping_dates WHERE uuid != OLD.uuid)
+        THEN RAISE(ABORT, 'overlapping activities')
+    END;
+END;
+
+DROP VIEW IF EXISTS running_activity;
+CREATE VIEW running_activity AS
+SELECT *
+FROM activities
+WHERE stop_dt IS NULL;
+"""
+
+
+def _init_db(conn: sqlite3.Connection) -> None:
+    """Create or upgrade the database schema.
+
+    The schema version is kept in `PRAGMA user_version`. The script below is
+    idempotent (triggers and views are dropped and recreated), so creating a
+    new database and upgrading an older one are the same operation.
 
     Partial expression index trick to constrain a single NULL:
     <https://momjian.us/main/blogs/pgblog/2017.html#April_3_2017>
+
+    The overlap check is split into two indexed range searches, as SQLite won't
+    use the indexes across OR-ed terms: activities starting within the new one
+    (on `activities_start_stop`), and activities enclosing its start (on
+    `activities_stop`; the unary `+` keeps the planner off the other index).
+    The latter doesn't assume that stored activities never overlap, as older
+    versions didn't check updates and may have let some through.
     """
-    f.parent.mkdir(parents=True, exist_ok=True)
-
-    raw_script = textwrap.dedent(
-        """\
-        CREATE TABLE IF NOT EXISTS activities (
-          uuid     TEXT PRIMARY KEY,
-          message  TEXT,
-          project  TEXT,
-          start_dt TEXT NOT NULL,
-          stop_dt  TEXT,
-
-          CHECK (message IS NULL OR message != '')
-          CHECK (project IS NULL OR project != '')
-          CHECK (datetime(start_dt) IS NOT NULL)
-          CHECK (datetime(stop_dt) IS NOT NULL OR stop_dt IS NULL)
-          CHECK (datetime(stop_dt) > datetime(start_dt))
-        ) WITHOUT ROWID, STRICT;
-
-        CREATE UNIQUE INDEX IF NOT EXISTS stop_dt_single_null
-        ON activities(stop_dt IS NULL)
-        WHERE stop_dt IS NULL;
-
-        CREATE TRIGGER IF NOT EXISTS validate_dates_before_insert
-        BEFORE INSERT ON activities
-        BEGIN
-          WITH overlapping_dates AS (
-            SELECT
-              *
-            FROM
-              activities
-            WHERE
-              start_dt BETWEEN NEW.start_dt AND NEW.stop_dt
-              OR stop_dt BETWEEN NEW.start_dt AND NEW.stop_dt
-              OR NEW.start_dt BETWEEN start_dt AND stop_dt
-          )
-          SELECT
-            CASE
-              WHEN datetime(NEW.start_dt) > datetime('now', 'localtime')
-                THEN RAISE(ABORT, 'start_dt is in the future')
-              WHEN datetime(NEW.stop_dt) > datetime('now', 'localtime')
-                THEN RAISE(ABORT, 'stop_dt is in the future')
-              WHEN EXISTS(SELECT * FROM overlapping_dates)
-                THEN RAISE(ABORT, 'overlapping activities')
-            END;
-        END;
-
-        CREATE TRIGGER IF NOT EXISTS validate_dates_before_update
-        BEFORE UPDATE ON activities
-        WHEN
-          NEW.start_dt IS NOT OLD.start_dt
-          OR NEW.stop_dt IS NOT OLD.stop_dt
-        BEGIN
-          WITH overlapping_dates AS (
-            SELECT
-              *
-            FROM
-              activities
-            WHERE
-              NEW.uuid != OLD.uuid
-              AND (
-                start_dt BETWEEN NEW.start_dt AND NEW.stop_dt
-                OR stop_dt BETWEEN NEW.start_dt AND NEW.stop_dt
-                OR NEW.start_dt BETWEEN start_dt AND stop_dt
-              )
-          )
-          SELECT
-            CASE
-              WHEN datetime(NEW.start_dt) > datetime('now', 'localtime')
-                THEN RAISE(ABORT, 'start_dt is in the future')
-              WHEN datetime(NEW.stop_dt) > datetime('now', 'localtime')
-                THEN RAISE(ABORT, 'stop_dt is in the future')
-              WHEN EXISTS(SELECT * FROM overlapping_dates)
-                THEN RAISE(ABORT, 'overlapping activities')
-            END;
-        END;
-
-        CREATE VIEW IF NOT EXISTS running_activity AS
-        SELECT *
-        FROM activities
-        WHERE stop_dt IS NULL;
-        """
-    )
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    if version >= _SCHEMA_VERSION:
+        return
 
-    conn = sqlite3.connect(f)
-    with conn:
-        conn.executescript(raw_script)
+    # the script leaves its transaction open so that it includes the version bump
+    conn.executescript(_SQL_SCHEMA)
+    conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION:d}")
+    conn.commit()
 
-    return conn
 
+# STRICT tables only accept the basic column types, so timestamps are stored
+# as TEXT and converted on the way out by naming the converter in the query:
+# `SELECT start_dt AS "start_dt [timestamp]" ...`
+sqlite3.register_converter(
+    "timestamp", lambda b: datetime.datetime.fromisoformat(b.decode())
+)
 
-@contextmanager
-def sqlite_db() -> Iterator[sqlite3.Connection]:
-    """Create and close an SQLite database connection.
+# same format as the builtin adapter, which is deprecated as of Python 3.12
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(" "))
+
+
+_SQL_CONNECTION_PRAGMAS = """\
+PRAGMA synchronous = NORMAL;
+PRAGMA temp_store = MEMORY;
+PRAGMA mmap_size = 134217728;"""
+
+_connections: dict[Path, sqlite3.Connection] = {}
 
-    Using a hand-rolled context manager to handle database connections as
-    the builtin sqlite3 module does not close a connection when it goes out of scope;
-    this is specially important as we want to quickly ditch the application when
-    encountering an exception and a connection is open. See:
+
+def _close_connection(conn: sqlite3.Connection) -> None:
+    """Close a connection, first letting SQLite refresh its planner statistics.
+
+    `PRAGMA optimize` only analyzes the tables whose queries, during the
+    lifetime of the connection, could have benefited from it; it's usually a
+    no-op. It's skipped if the database is busy. See
+    <https://www.sqlite.org/pragma.html#pragma_optimize>.
+    """
+    with suppress(sqlite3.Error):
+        conn.execute("PRAGMA optimize")
+
+    conn.close()
+
+
+@contextmanager
+def sqlite_db(immediate: bool = False) -> Iterator[sqlite3.Connection]:
+    """Provide a transaction on the SQLite database connection.
+
+    Commands that write should pass `immediate=True`, taking the write lock
+    upfront with `BEGIN IMMEDIATE`: in WAL mode, a deferred transaction that
+    reads before writing fails with SQLITE_BUSY if another connection wrote in
+    the meantime, instead of waiting for the lock.
+
+    Connections are opened once per database path and reused for the rest of
+    the process, so repeated calls skip the connection setup work; they are
+    closed by an `atexit` hook (`_close_connection`), as the builtin sqlite3
+    module does not close a connection when it goes out of scope. See:
     - <https://softwareengineering.stackexchange.com/q/200522>
     - <https://eli.thegreenplace.net/2009/06/12/safely-using-destructors-in-python>
 
+    The database is in WAL mode with `synchronous=NORMAL`: a commit is a single
+    append to the WAL and survives an application or OS crash, but a power loss
+    may roll back the last few transactions. This is an acceptable trade-off for
+    a time tracker. See <https://www.sqlite.org/pragma.html#pragma_synchronous>.
+    Reads go through a memory map (up to 128 MiB) and temporary tables and
+    indices are kept in memory.
+
     Can use something like `conn.set_trace_callback(print)`
     to facilitate statement debugging during development.
     """
     f = get_db_path()
-    if not f.exists():
-        conn = _init_db(f)
-    else:
-        conn = sqlite3.connect(f)
+    conn = _connections.get(f)
+    if conn is None:
+        try:
+            conn = sqlite3.connect(f, detect_types=sqlite3.PARSE_COLNAMES)
+        except sqlite3.OperationalError:
+            # first run: the data directory may not exist yet
+            f.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(f, detect_types=sqlite3.PARSE_COLNAMES)
+        conn.executescript(_SQL_CONNECTION_PRAGMAS)
+        try:
+            _init_db(conn)
+        except BaseException:
+            conn.close()
+            raise
 
-    try:
-        # <https://www.sqlite.org/pragma.html#pragma_integrity_check>
-        result, *_ = conn.execute("PRAGMA integrity_check").fetchone()
-        assert result == "ok", "database did not pass integrity check"
+        _connections[f] = conn
+        atexit.register(_close_connection, conn)
+
+    if immediate:
+        conn.execute("BEGIN IMMEDIATE")
 
+    try:
         yield conn
+    except BaseException:
+        # this includes the SystemExit raised by `fatal`
+        conn.rollback()
+        raise
 
-        # let's make sure we only commit if no exception was raised:
-        conn.commit()
-    finally:
-        conn.close()
+    conn.commit()
 
 
 def parse_user_datetime(s: str) -> datetime.datetime:
@@ -185,7 +276,14 @@ def parse_user_datetime(s: str) -> datetime.datetime:
             datetime.date.today(), datetime.time.fromisoformat(s)
         )
 
-    for parsing_func in [datetime.datetime.fromisoformat, just_time]:
+    # bare times (`HH:MM[:SS]`) are the most common input and can't be parsed
+    # as datetimes; trying them first spares raising and catching a ValueError
+    if s[2:3] == ":":
+        parsers = [just_time, datetime.datetime.fromisoformat]
+    else:
+        parsers = [datetime.datetime.fromisoformat, just_time]
+
+    for parsing_func in parsers:
         try:
             return parsing_func(s)
         except ValueError:
@@ -194,25 +292,63 @@ def parse_user_datetime(s: str) -> datetime.datetime:
     raise ValueError(f"could not parse `{s}` as a datetime")
 
 
+def _new_ids(batch_size: int = 256) -> Iterator[str]:
+    """Generate random (version 4) UUID strings.
+
+    Formatted by hand to avoid importing `uuid`, which is comparatively slow to
+    import and otherwise unused. See RFC 4122, section 4.4.
+    Randomness is read `batch_size` UUIDs at a time, amortizing the syscall.
+    """
+    while True:
+        b = bytearray(os.urandom(16 * batch_size))
+        for i in range(0, len(b), 16):
+            b[i + 6] = (b[i + 6] & 0x0F) | 0x40
+            b[i + 8] = (b[i + 8] & 0x3F) | 0x80
+
+        h = b.hex()
+        for i in range(0, len(h), 32):
+            yield (
+                f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}"
+                f"-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}"
+            )
+
+
+def _new_id() -> str:
+    return next(_new_ids(batch_size=1))
+
+
+_SQL_RUNNING_SELECT = """\
+SELECT
+  message,
+  project,
+  start_dt AS "start_dt [timestamp]"
+FROM
+  running_activity
+LIMIT
+  1"""
+
+
 def root_cmd(args: argparse.Namespace) -> None:
     with sqlite_db() as db_conn:
-        row = db_conn.execute("SELECT * FROM running_activity").fetchone()
+        row = db_conn.execute(_SQL_RUNNING_SELECT).fetchone()
 
     if not row:
         print("no tracking ongoing")
         return
 
-    _, message, project, start_dt, _ = row
+    message, project, start_dt = row
     message = message or "∅"
     project = project or "∅"
-    dt = datetime.datetime.fromisoformat(start_dt)
 
-    elapsed = datetime.datetime.now() - dt
+    elapsed = datetime.datetime.now() - start_dt
     elapsed -= datetime.timedelta(microseconds=elapsed.microseconds)
 
     print(f"tracking {message} [{project}] for {elapsed}")
 
 
+_SQL_INSERT_ACTIVITY = "INSERT INTO activities VALUES (?, ?, ?, ?, ?)"
+
+
 def start_cmd(args: argparse.Namespace) -> None:
     if args.at is not None:
         try:
@@ -222,12 +358,11 @@ def start_cmd(args: argparse.Namespace) -> None:
     else:
         dt = datetime.datetime.now()
 
-    id_ = str(uuid.uuid4())
-    with sqlite_db() as db_conn:
+    id_ = _new_id()
+    with sqlite_db(immediate=True) as db_conn:
         try:
             db_conn.execute(
-                "INSERT INTO activities VALUES (?, ?, ?, ?, ?)",
-                (id_, args.message, args.project, dt, None),
+                _SQL_INSERT_ACTIVITY, (id_, args.message, args.project, dt, None)
             )
         except sqlite3.IntegrityError as e:
             match str(e):
@@ -239,16 +374,29 @@ def start_cmd(args: argparse.Namespace) -> None:
     print(id_)
 
 
+_SQL_UPDATE_STOP = """\
+UPDATE
+  activities
+SET
+  message = ?,
+  project = ?,
+  stop_dt = ?
+WHERE
+  uuid = ?"""
+
+
 def stop_cmd(args: argparse.Namespace) -> None:
     if args.discard and (args.message or args.project or args.at):
         fatal("incompatible options: modifiers should not be used with discard")
 
-    with sqlite_db() as db_conn:
-        row = db_conn.execute("SELECT * FROM running_activity").fetchone()
+    with sqlite_db(immediate=True) as db_conn:
+        row = db_conn.execute(
+            "SELECT uuid, message, project FROM running_activity LIMIT 1"
+        ).fetchone()
         if not row:
             fatal("no running activity")
 
-        id_, message, project, _, _ = row
+        id_, message, project = row
 
         if args.discard:
             db_conn.execute("DELETE FROM activities WHERE uuid = ?", (id_,))
@@ -268,20 +416,8 @@ def stop_cmd(args: argparse.Namespace) -> None:
         else:
             dt = datetime.datetime.now()
 
-        stmt = textwrap.dedent(
-            """\
-            UPDATE
-              activities
-            SET
-              message = ?,
-              project = ?,
-              stop_dt = ?
-            WHERE
-              uuid = ?"""
-        )
-
         try:
-            db_conn.execute(stmt, (message, project, dt, id_))
+            db_conn.execute(_SQL_UPDATE_STOP, (message, project, dt, id_))
         except sqlite3.IntegrityError as e:
             fatal(e)
 
@@ -294,11 +430,11 @@ def add_cmd(args: argparse.Namespace) -> None:
     except ValueError as e:
         fatal(e)
 
-    id_ = str(uuid.uuid4())
-    with sqlite_db() as db_conn:
+    id_ = _new_id()
+    with sqlite_db(immediate=True) as db_conn:
         try:
             db_conn.execute(
-                "INSERT INTO activities VALUES (?, ?, ?, ?, ?)",
+                _SQL_INSERT_ACTIVITY,
                 (id_, args.message, args.project, start_dt, stop_dt),
             )
         except sqlite3.IntegrityError as e:
@@ -307,6 +443,41 @@ def add_cmd(args: argparse.Namespace) -> None:
     print(id_)
 
 
+# day, times, and duration (in milliseconds) are computed by SQLite;
+# rows come straight off the activities_start_stop index, already sorted,
+# so they can be streamed to the terminal
+_SQL_LOG_SELECT = """\
+SELECT
+  uuid,
+  message,
+  project,
+  date(start_dt),
+  strftime('%H:%M', start_dt),
+  strftime('%H:%M', stop_dt),
+  CAST(
+    round((julianday(stop_dt) - julianday(start_dt)) * 86400000)
+    AS INTEGER
+  )
+FROM
+  activities
+WHERE
+  start_dt >= ?
+  AND stop_dt <= ?
+ORDER BY
+  start_dt DESC"""
+
+
+# the project column is sized before any row gets printed
+_SQL_LOG_PROJECT_LENGTH = """\
+SELECT
+  max(coalesce(length(project), 1))
+FROM
+  activities
+WHERE
+  start_dt >= ?
+  AND stop_dt <= ?"""
+
+
 def log_cmd(args: argparse.Namespace) -> None:
     if args.today and (args.since or args.until):
         fatal("incompatible options: range modifiers should not be used with today")
@@ -334,73 +505,75 @@ def log_cmd(args: argparse.Namespace) -> None:
     else:
         until_dt = datetime.datetime.now()
 
-    with sqlite_db() as db_conn:
-        stmt = textwrap.dedent(
-            """\
-            SELECT
-              *
-            FROM
-              activities
-            WHERE
-              start_dt >= ?
-              AND stop_dt <= ?
-            ORDER BY
-              start_dt DESC"""
-        )
-
-        rows = db_conn.execute(stmt, (since_dt, until_dt)).fetchall()
-
-    if not rows:
-        print("no recorded activities")
-        return
-
-    def group_by_day(row: tuple[str, str, str, str, str]) -> datetime.date:
-        _, _, _, start_dt, _ = row
-        return datetime.datetime.fromisoformat(start_dt).date()
-
-    def day_duration(group: list[tuple[str, str, str, str, str]]) -> datetime.timedelta:
-        total = datetime.timedelta()
-        for row in group:
-            _, _, _, raw_start, raw_stop = row
-            start_dt = datetime.datetime.fromisoformat(raw_start)
-            stop_dt = datetime.datetime.fromisoformat(raw_stop)
-
-            total += stop_dt - start_dt
+    def group_by_day(row: tuple[str, str, str, str, str, str, int]) -> str:
+        return row[3]
 
+    def day_duration(
+        group: list[tuple[str, str, str, str, str, str, int]]
+    ) -> datetime.timedelta:
+        total = datetime.timedelta(milliseconds=sum(row[6] for row in group))
         total -= datetime.timedelta(microseconds=total.microseconds)
         return total
 
-    project_length = max(len(p) if p else 1 for _, _, p, _, _ in rows)
-    message_length = 58 - project_length
+    with sqlite_db() as db_conn:
+        cur = db_conn.execute(_SQL_LOG_SELECT, (since_dt, until_dt))
 
-    grouped_days = [(k, list(g)) for k, g in itertools.groupby(rows, group_by_day)]
-    for i, (k, g) in enumerate(grouped_days):
-        if i:
-            print()
-        print("\x1b[1m" + str(k) + str(day_duration(g)).rjust(78) + "\x1b[0m")
+        first = next(cur, None)
+        if first is None:
+            print("no recorded activities")
+            return
 
-        for j, row in enumerate(g, start=1):
-            activity_uuid, message, project, start_dt, stop_dt = row
+        (project_length,) = db_conn.execute(
+            _SQL_LOG_PROJECT_LENGTH, (since_dt, until_dt)
+        ).fetchone()
+        message_length = 58 - project_length
+
+        rows = itertools.chain([first], cur)
+        for i, (k, it) in enumerate(itertools.groupby(rows, group_by_day)):
+            g = list(it)
+            if i:
+                print()
+            print("\x1b[1m" + k + str(day_duration(g)).rjust(78) + "\x1b[0m")
+
+            last = len(g)
+            for j, row in enumerate(g, start=1):
+                activity_uuid, message, project, _, start_time, stop_time, _ = row
+                print(
+                    f"{'├' if j != last else '└'} "
+                    f"{message or '∅':{message_length}.{message_length}} │ "
+                    f"{project or '∅':{project_length}} │ "
+                    f"{start_time}-{stop_time} │ {activity_uuid[:8]}"
+                )
 
-            id_ = activity_uuid[:8]
-            message = f"{message or '∅':{message_length}.{message_length}}"
-            project = f"{project or '∅':{project_length}}"
-            start_time = datetime.datetime.fromisoformat(start_dt).strftime("%H:%M")
-            stop_time = datetime.datetime.fromisoformat(stop_dt).strftime("%H:%M")
 
-            ladder = "├" if j < len(g) else "└"
-            print(f"{ladder} {message} │ {project} │ {start_time}-{stop_time} │ {id_}")
+_SQL_UUID_PREFIX_SELECT = """\
+SELECT
+  uuid
+FROM
+  activities
+WHERE
+  (uuid >= ? AND uuid < ?)
+  OR (uuid >= ? AND uuid < ?)
+  OR (uuid >= ? AND uuid < ?)
+LIMIT
+  2"""
 
 
 def delete_cmd(args: argparse.Namespace) -> None:
     if len(args.activity_uuid) < 4:
         fatal(f"ambiguous uuid {args.activity_uuid!r}")
 
-    with sqlite_db() as db_conn:
-        expr = args.activity_uuid + "%"
-        rows = db_conn.execute(
-            "SELECT uuid FROM activities WHERE uuid LIKE ?", (expr,)
-        ).fetchall()
+    # matching on [prefix, successor) is a range search on the primary key, and
+    # two rows are enough to detect ambiguity; qz stores uuids in lowercase, but
+    # rows inserted by hand may not be, so the prefix is searched as typed and in
+    # either case (SQLite merges the searches without duplicates)
+    typed = args.activity_uuid
+    bounds: list[str] = []
+    for prefix in (typed, typed.lower(), typed.upper()):
+        bounds += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+
+    with sqlite_db(immediate=True) as db_conn:
+        rows = db_conn.execute(_SQL_UUID_PREFIX_SELECT, bounds).fetchall()
 
         match len(rows):
             case 0:
@@ -410,47 +583,65 @@ def delete_cmd(args: argparse.Namespace) -> None:
             case _:
                 fatal(f"ambiguous uuid {args.activity_uuid!r}: use the full identifier")
 
-        id_, *_ = rows[0]
+        id_ = rows[0][0]
         db_conn.execute("DELETE FROM activities WHERE uuid = ?", (id_,))
 
     print(id_)
 
 
 def import_cmd(args: argparse.Namespace) -> None:
-    to_insert = []
+    import csv
+
+    ids = []
+    new_ids = _new_ids()
+
+    def toggl_rows(
+        csv_file: TextIO,
+    ) -> Iterator[tuple[str, str, str, datetime.datetime, datetime.datetime]]:
+        for row in csv.DictReader(csv_file):
+            message = row["Description"]
+            project = row["Project"]
+            start_dt = datetime.datetime.combine(
+                datetime.date.fromisoformat(row["Start date"]),
+                datetime.time.fromisoformat(row["Start time"]),
+            )
+            stop_dt = datetime.datetime.combine(
+                datetime.date.fromisoformat(row["End date"]),
+                datetime.time.fromisoformat(row["End time"]),
+            )
+
+            id_ = next(new_ids)
+            ids.append(id_)
+            yield (id_, message, project, start_dt, stop_dt)
 
     # no need to parse args.tool as we're only supporting 'toggl'
     try:
-        with open(args.file, newline="") as csv_file:
-            for row in csv.DictReader(csv_file):
-                message = row["Description"]
-                project = row["Project"]
-                start_dt = datetime.datetime.combine(
-                    datetime.date.fromisoformat(row["Start date"]),
-                    datetime.time.fromisoformat(row["Start time"]),
-                )
-                stop_dt = datetime.datetime.combine(
-                    datetime.date.fromisoformat(row["End date"]),
-                    datetime.time.fromisoformat(row["End time"]),
-                )
-
-                id_ = str(uuid.uuid4())
-                to_insert.append((id_, message, project, start_dt, stop_dt))
-
+        csv_file = open(args.file, newline="")
     except FileNotFoundError:
         fatal(f"no such file `{args.file}`")
 
-    with sqlite_db() as db_conn:
+    # rows are parsed lazily as sqlite3 consumes them, so the file is never
+    # held in memory as a whole
+    with csv_file, sqlite_db(immediate=True) as db_conn:
+        # the whole batch goes in as a single transaction, committed on exit
         try:
-            db_conn.executemany(
-                "INSERT INTO activities VALUES (?, ?, ?, ?, ?)",
-                to_insert,
-            )
+            db_conn.executemany(_SQL_INSERT_ACTIVITY, toggl_rows(csv_file))
         except sqlite3.IntegrityError as e:
             fatal(e)
 
-    for id_, *_ in to_insert:
-        print(id_)
+    if ids:
+        print("\n".join(ids))
+
+
+def check_cmd(args: argparse.Namespace) -> None:
+    with sqlite_db() as db_conn:
+        # <https://www.sqlite.org/pragma.html#pragma_integrity_check>
+        problems = [msg for msg, in db_conn.execute("PRAGMA integrity_check")]
+
+    if problems != ["ok"]:
+        fatal("database did not pass integrity check\n" + "\n".join(problems))
+
+    print("ok")
 
 
 def status_cmd(args: argparse.Namespace) -> None:
@@ -465,9 +656,10 @@ class ArgumentParser(argparse.ArgumentParser):
     """
 
     def error(self, message: str) -> NoReturn:
-        pat = re.compile(r"argument <command>: invalid choice: '(.+?)'")
-        if m := pat.match(message):
-            message = f"{m.group(1)!r} is not a qz command"
+        prefix = "argument <command>: invalid choice: '"
+        if message.startswith(prefix):
+            choice, _, _ = message[len(prefix) :].partition("'")
+            message = f"{choice!r} is not a qz command"
 
         fatal(message)
 
@@ -507,23 +699,10 @@ class LocateAction(argparse.Action):
         sys.exit(0)
 
 
-def main(args: Sequence[str] | None = None) -> int:
-    parser = ArgumentParser(
-        description=(
-            "Barebones time-tracking CLI app.\n"
-            "\n"
-            "Run with no arguments to get current tracking status."
-        ),
-        formatter_class=SubcommandHelpFormatter,
-    )
-    parser.add_argument(
-        "-v", "--version", action="version", version=f"qz version {__version__}"
-    )
-    parser.add_argument("--locate", action=LocateAction)
-    parser.set_defaults(func=root_cmd)
+_SubParsers: TypeAlias = "argparse._SubParsersAction[ArgumentParser]"
 
-    subparsers = parser.add_subparsers(title="subcommands", metavar="<command>")
 
+def _add_start_parser(subparsers: _SubParsers) -> None:
     parser_start = subparsers.add_parser(
         "start",
         help="start tracking an activity",
@@ -536,6 +715,8 @@ def main(args: Sequence[str] | None = None) -> int:
     )
     parser_start.set_defaults(func=start_cmd)
 
+
+def _add_stop_parser(subparsers: _SubParsers) -> None:
     parser_stop = subparsers.add_parser(
         "stop",
         usage=(
@@ -557,6 +738,8 @@ def main(args: Sequence[str] | None = None) -> int:
     parser_stop.add_argument("--discard", action="store_true", help="discard activity")
     parser_stop.set_defaults(func=stop_cmd)
 
+
+def _add_add_parser(subparsers: _SubParsers) -> None:
     parser_add = subparsers.add_parser(
         "add",
         help="add a parametrized activity",
@@ -568,6 +751,8 @@ def main(args: Sequence[str] | None = None) -> int:
     parser_add.add_argument("-p", "--project", help="set project", metavar="<proj>")
     parser_add.set_defaults(func=add_cmd)
 
+
+def _add_log_parser(subparsers: _SubParsers) -> None:
     parser_log = subparsers.add_parser(
         "log",
         help="show activity logs",
@@ -575,12 +760,10 @@ def main(args: Sequence[str] | None = None) -> int:
             "%(prog)s [-h] [--since <datetime>] [--until <datetime>]\n"
             "       %(prog)s [-h] [--today]"
         ),
-        description=textwrap.dedent(
-            """\
-            Show activity logs.
-
-            By default only shows activities of the past 3 days.
-            """
+        description=(
+            "Show activity logs.\n"
+            "\n"
+            "By default only shows activities of the past 3 days.\n"
         ),
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
@@ -599,12 +782,16 @@ def main(args: Sequence[str] | None = None) -> int:
     )
     parser_log.set_defaults(func=log_cmd)
 
+
+def _add_delete_parser(subparsers: _SubParsers) -> None:
     parser_delete = subparsers.add_parser(
         "delete", help="delete an activity", description="Delete an activity."
     )
     parser_delete.add_argument("activity_uuid", metavar="<activity_uuid>")
     parser_delete.set_defaults(func=delete_cmd)
 
+
+def _add_import_parser(subparsers: _SubParsers) -> None:
     parser_import = subparsers.add_parser(
         "import",
         help="import activities from other tools",
@@ -621,12 +808,86 @@ def main(args: Sequence[str] | None = None) -> int:
     parser_import.add_argument("file", help="tool-specific data file", metavar="<file>")
     parser_import.set_defaults(func=import_cmd)
 
+
+def _add_check_parser(subparsers: _SubParsers) -> None:
+    parser_check = subparsers.add_parser(
+        "check",
+        help="check database integrity",
+        description=(
+            "Check database integrity.\n"
+            "\n"
+            "Runs a full integrity check, which reads the entire database file."
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser_check.set_defaults(func=check_cmd)
+
+
+def _add_status_parser(subparsers: _SubParsers) -> None:
     parser_status = subparsers.add_parser(
         "status", description="Alias to root command without extra options."
     )
     parser_status.set_defaults(func=status_cmd)
 
-    parsed_args = parser.parse_args(args)
+
+_SUBPARSER_BUILDERS = {
+    "start": _add_start_parser,
+    "stop": _add_stop_parser,
+    "add": _add_add_parser,
+    "log": _add_log_parser,
+    "delete": _add_delete_parser,
+    "import": _add_import_parser,
+    "check": _add_check_parser,
+    "status": _add_status_parser,
+}
+
+
+@lru_cache
+def _build_parser(commands: tuple[str, ...], prog: str) -> ArgumentParser:
+    """Build the argument parser, with subparsers for the given commands only.
+
+    Cached, as parsers don't hold any state between `parse_args` calls;
+    this matters when `main` is called repeatedly, as in the test suite.
+    The program name is part of the cache key as it shows up in usage messages.
+    """
+    parser = ArgumentParser(
+        prog=prog,
+        description=(
+            "Barebones time-tracking CLI app.\n"
+            "\n"
+            "Run with no arguments to get current tracking status."
+        ),
+        formatter_class=SubcommandHelpFormatter,
+    )
+    parser.add_argument(
+        "-v", "--version", action="version", version=f"qz version {__version__}"
+    )
+    parser.add_argument("--locate", action=LocateAction)
+    parser.set_defaults(func=root_cmd)
+
+    subparsers = parser.add_subparsers(title="subcommands", metavar="<command>")
+    for cmd in commands:
+        _SUBPARSER_BUILDERS[cmd](subparsers)
+
+    return parser
+
+
+def main(args: Sequence[str] | None = None, *, prog: str | None = None) -> int:
+    # building every subparser is wasted work when only one of them is used;
+    # the full tree is still needed for help output and error reporting
+    argv = sys.argv[1:] if args is None else args
+    match argv[:1]:
+        case []:
+            commands: tuple[str, ...] = ()
+        case [cmd] if cmd in _SUBPARSER_BUILDERS:
+            commands = (cmd,)
+        case _:
+            commands = tuple(_SUBPARSER_BUILDERS)
+
+    if prog is None:
+        prog = os.path.basename(sys.argv[0])
+
+    parsed_args = _build_parser(commands, prog).parse_args(args)
     parsed_args.func(parsed_args)
 
     return 0
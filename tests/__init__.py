@@ -13,3 +13,15 @@ Mocking datetime.datetime.now:
 Different scopes for same fixture:
   - <https://github.com/pytest-dev/pytest/issues/3425>
 """
+
+from qz import main
+
+
+def assert_exits(args, *, code=1, **kwargs):
+    """Run `main` with `args` and check that it exits with status `code`."""
+    try:
+        main(args, **kwargs)
+    except SystemExit as e:
+        assert e.code == code, f"exit status {e.code!r} != {code!r} for {args}"
+    else:
+        raise AssertionError(f"no exit for {args}")
@@ -1,11 +1,14 @@
 import datetime
+import shutil
 import uuid
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 
-from qz import sqlite_db
+from qz import _SQL_CONNECTION_PRAGMAS
+from qz import __name__ as qz_module
+from qz import _connections, sqlite_db
 
 
 def pytest_make_parametrize_id(config, val, argname):
@@ -17,7 +20,7 @@ def pytest_make_parametrize_id(config, val, argname):
 
 
 def pytest_collection_modifyitems(session, config, items):
-    order = ["misc", "root", "start", "stop", "add", "log", "delete", "import"]
+    order = ["misc", "root", "start", "stop", "add", "log", "delete", "import", "check"]
 
     def sort_func(pytest_item):
         p, *_ = pytest_item.reportinfo()
@@ -32,23 +35,75 @@ def frozen_now():
     return datetime.datetime(2022, 7, 30, 9, 0, 0)
 
 
+class _Stub:
+    """Stand-in that overrides some attributes and delegates the rest.
+
+    Cheaper than `mock.patch(..., wraps=...)`, and unlike subclassing it keeps
+    the real `datetime` types, which sqlite3 looks up adapters by.
+    """
+
+    def __init__(self, wrapped, **overrides):
+        self._wrapped = wrapped
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+
 @pytest.fixture
-def mock_env_db(tmp_path):
-    tmp_db = Path(tmp_path) / "store.db"
-    with patch.dict("os.environ", {"QZ_DB": str(tmp_db)}):
-        yield
+def frozen_datetime(monkeypatch, frozen_now):
+    stub = _Stub(
+        datetime,
+        datetime=_Stub(datetime.datetime, now=lambda tz=None: frozen_now),
+        date=_Stub(datetime.date, today=frozen_now.date),
+    )
+    monkeypatch.setattr(f"{qz_module}.datetime", stub)
 
 
 @pytest.fixture
-def stopped_db(capsys, mock_env_db):
+def mock_env_db(monkeypatch, tmp_path):
+    # test databases don't need to survive a crash, so skip syncing them to disk
+    monkeypatch.setattr(
+        f"{qz_module}._SQL_CONNECTION_PRAGMAS",
+        _SQL_CONNECTION_PRAGMAS + "\nPRAGMA synchronous = OFF;",
+    )
+
+    tmp_db = (Path(tmp_path) / "store.db").resolve()
+    with patch.dict("os.environ", {"QZ_DB": str(tmp_db)}):
+        yield tmp_db
+
+    # don't keep every test's database open until the session ends
+    conn = _connections.pop(tmp_db, None)
+    if conn is not None:
+        conn.close()
+
+
+@pytest.fixture(scope="session")
+def stopped_db_template(tmp_path_factory):
+    """Database with a few stopped activities, created once and copied per test."""
+    template = tmp_path_factory.mktemp("template") / "store.db"
+
     id1, id2, id3 = [str(uuid.uuid4()) for _ in range(3)]
     data = [
         (id1, "call with leslie", "manhattan", "1942-12-15 12:34", "1942-12-15 14:13"),
         (id2, "talk with robert", "manhattan", "1943-01-01 08:00", "1943-01-01 09:00"),
         (id3, "trinity test", "manhattan", "1945-07-16 08:01", "1945-07-16 17:00"),
     ]
-    with sqlite_db() as conn:
-        conn.executemany("INSERT INTO activities VALUES (?, ?, ?, ?, ?)", data)
+    with patch.dict("os.environ", {"QZ_DB": str(template)}):
+        with sqlite_db() as conn:
+            conn.executemany("INSERT INTO activities VALUES (?, ?, ?, ?, ?)", data)
+
+    # closing the last connection checkpoints the WAL into the database file
+    _connections.pop(template.resolve()).close()
+    return template, [id1, id2, id3]
+
+
+@pytest.fixture
+def stopped_db(capsys, mock_env_db, stopped_db_template):
+    """Copy of the template database; returns the uuids of its activities."""
+    template, ids = stopped_db_template
+    shutil.copyfile(template, mock_env_db)
+    return ids
 
 
 @pytest.fixture
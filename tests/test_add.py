@@ -1,10 +1,7 @@
-import datetime
-from unittest.mock import patch
-
 import pytest
 
-from qz import __name__ as qz_module
 from qz import main, sqlite_db
+from tests import assert_exits
 
 
 @pytest.mark.parametrize(
@@ -14,64 +11,70 @@ from qz import main, sqlite_db
         ["add", "08:00", "20:00", "-m", "orion stacking"],
     ],
 )
-def test_good(capsys, stopped_db, frozen_now, args):
-    with sqlite_db() as conn:
-        n, *_ = conn.execute("SELECT COUNT(*) FROM activities").fetchone()
-
-    with patch(f"{qz_module}.datetime", wraps=datetime) as dt:
-        dt.date.today.return_value = frozen_now.date()
-        main(args)
+def test_good(capsys, stopped_db, frozen_datetime, args):
+    main(args)
 
     with sqlite_db() as conn:
         rows = conn.execute("SELECT uuid FROM activities").fetchall()
 
-    assert len(rows) == n + 1
-
-    activity_uuids = [u for u, *_ in rows]
     captured_out, captured_err = capsys.readouterr()
 
-    assert captured_out.strip() in activity_uuids
+    assert sorted(u for u, in rows) == sorted([*stopped_db, captured_out.strip()])
     assert captured_err == ""
 
 
-@pytest.mark.parametrize(
-    "args",
-    [
-        ["add"],
-        ["add", "10:00"],
-    ],
-)
-def test_missing_datetimes(stopped_db, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
+def test_stored_format(capsys, stopped_db):
+    main(["add", "1969-07-16 13:32:00.5", "1969-07-24 16:50:35"])
+    id_ = capsys.readouterr().out.strip()
+
+    with sqlite_db() as conn:
+        row = conn.execute(
+            "SELECT start_dt, stop_dt FROM activities WHERE uuid = ?", (id_,)
+        ).fetchone()
 
-    assert exc_info.value.code == 1
+    assert row == ("1969-07-16 13:32:00.500000", "1969-07-24 16:50:35")
 
 
-@pytest.mark.parametrize(
-    "args",
-    [
+def test_bad_args(stopped_db):
+    bad_args = [
+        # missing datetimes
+        ["add"],
+        ["add", "10:00"],
+        # bad datetimes
         ["add", "10:00", "10:65"],
         ["add", "09:99", "10:55"],
-    ],
-)
-def test_bad_datetimes(stopped_db, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
-
-    assert exc_info.value.code == 1
+        # bad metadata
+        ["add", "10:00", "10:55", "-m"],
+        ["add", "10:00", "10:55", "-m", ""],
+        ["add", "10:00", "10:55", "-p", ""],
+    ]
+    for args in bad_args:
+        assert_exits(args)
 
 
 @pytest.mark.parametrize(
-    "args",
+    ("start", "stop"),
     [
-        ["add", "10:00", "10:55", "-m"],
-        ["add", "10:00", "10:55", "-m", ""],
-        ["add", "10:00", "10:55", "-p", ""],
+        pytest.param("1945-07-16 07:00", "1945-07-16 09:00", id="over-start"),
+        pytest.param("1945-07-16 16:00", "1945-07-16 18:00", id="over-stop"),
+        pytest.param("1945-07-16 09:00", "1945-07-16 10:00", id="inside"),
+        pytest.param("1945-07-16 07:00", "1945-07-16 18:00", id="around"),
+        pytest.param("1945-07-16 17:00", "1945-07-16 18:00", id="touching-stop"),
+        pytest.param("1945-07-16 07:00", "1945-07-16 08:01", id="touching-start"),
     ],
 )
-def test_bad_metadata(stopped_db, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
+def test_overlapping(capsys, stopped_db, start, stop):
+    # timestamps are compared as text, so store them the way qz writes them
+    with sqlite_db() as conn:
+        conn.execute(
+            "UPDATE activities"
+            " SET start_dt = datetime(start_dt), stop_dt = datetime(stop_dt)"
+        )
+
+    assert_exits(["add", start, stop])
+
+    with sqlite_db() as conn:
+        (n,) = conn.execute("SELECT COUNT(*) FROM activities").fetchone()
 
-    assert exc_info.value.code == 1
+    assert n == len(stopped_db)
+    assert capsys.readouterr() == ("", "qz: overlapping activities\n")
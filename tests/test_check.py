@@ -0,0 +1,9 @@
+from qz import main
+
+
+def test_good(capsys, stopped_db):
+    main(["check"])
+
+    expected_stdout = "ok\n"
+    expected_stderr = ""
+    assert capsys.readouterr() == (expected_stdout, expected_stderr)
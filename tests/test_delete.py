@@ -0,0 +1,68 @@
+import pytest
+
+from qz import _SQL_UUID_PREFIX_SELECT, main, sqlite_db
+from tests import assert_exits
+
+
+@pytest.mark.parametrize("length", [4, 8, 36])
+def test_good(capsys, stopped_db, length):
+    with sqlite_db() as conn:
+        rows = conn.execute("SELECT uuid FROM activities").fetchall()
+
+    id_, *_ = rows[0]
+    main(["delete", id_[:length].upper()])
+
+    with sqlite_db() as conn:
+        remaining = conn.execute("SELECT uuid FROM activities").fetchall()
+
+    assert (id_,) not in remaining
+    assert len(remaining) == len(rows) - 1
+    assert capsys.readouterr() == (id_ + "\n", "")
+
+
+@pytest.mark.parametrize("prefix", ["ABCDEF01", "abcdef01", "ABCDEF01-0000"])
+def test_uppercase_stored_uuid(capsys, stopped_db, prefix):
+    # rows inserted by hand don't necessarily have lowercase uuids
+    id_ = "ABCDEF01-0000-4000-8000-000000000000"
+    with sqlite_db() as conn:
+        conn.execute(
+            "INSERT INTO activities VALUES (?, ?, ?, ?, ?)",
+            (id_, None, None, "1944-06-06 08:00:00", "1944-06-06 10:00:00"),
+        )
+
+    main(["delete", prefix])
+
+    with sqlite_db() as conn:
+        (n,) = conn.execute("SELECT COUNT(*) FROM activities").fetchone()
+
+    assert n == len(stopped_db)
+    assert capsys.readouterr() == (id_ + "\n", "")
+
+
+@pytest.mark.parametrize(
+    "prefix, err",
+    [
+        ("abc", "qz: ambiguous uuid 'abc'\n"),
+        ("ffff", "qz: could not find matching uuid 'ffff'\n"),
+        ("abcd", "qz: ambiguous uuid 'abcd': use the full identifier\n"),
+    ],
+)
+def test_bad_uuid(capsys, stopped_db, prefix, err):
+    with sqlite_db() as conn:
+        conn.execute("UPDATE activities SET uuid = 'abcd' || substr(uuid, 5)")
+
+    assert_exits(["delete", prefix])
+    assert capsys.readouterr() == ("", err)
+
+
+def test_query_plan(mock_env_db):
+    with sqlite_db() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN " + _SQL_UUID_PREFIX_SELECT,
+            ("abcd", "abce", "abcd", "abce", "ABCD", "ABCE"),
+        ).fetchall()
+
+    # the plan's wording isn't a stable interface, only check what matters
+    details = [d for *_, d in plan]
+    assert any("USING PRIMARY KEY" in d for d in details)
+    assert not any("SCAN" in d or "TEMP B-TREE" in d for d in details)
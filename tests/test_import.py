@@ -0,0 +1,72 @@
+import textwrap
+
+import pytest
+
+from qz import main, sqlite_db
+from tests import assert_exits
+
+HEADER = (
+    "User,Email,Client,Project,Task,Description,Billable,"
+    "Start date,Start time,End date,End time,Duration,Tags,Amount ()"
+)
+
+
+@pytest.fixture
+def toggl_csv(tmp_path):
+    def write(*rows):
+        f = tmp_path / "toggl.csv"
+        f.write_text("\n".join([HEADER, *rows]) + "\n")
+        return str(f)
+
+    return write
+
+
+def test_good(capsys, stopped_db, toggl_csv):
+    f = toggl_csv(
+        "leslie,,,manhattan,,oak ridge visit,No,"
+        "1944-03-02,10:00:00,1944-03-02,12:30:00,02:30:00,,",
+        "leslie,,,manhattan,,hanford visit,No,"
+        "1944-03-01,09:00:00,1944-03-01,17:00:00,08:00:00,,",
+    )
+
+    main(["import", "-t", "toggl", f])
+
+    with sqlite_db() as conn:
+        rows = conn.execute(
+            "SELECT message, uuid FROM activities WHERE start_dt LIKE '1944-%'"
+        ).fetchall()
+
+    ids = dict(rows)
+    expected_stdout = textwrap.dedent(
+        f"""\
+        {ids["oak ridge visit"]}
+        {ids["hanford visit"]}
+        """
+    )
+    assert capsys.readouterr() == (expected_stdout, "")
+
+
+def test_overlapping(capsys, stopped_db, toggl_csv):
+    f = toggl_csv(
+        "leslie,,,manhattan,,hanford visit,No,"
+        "1944-03-01,09:00:00,1944-03-01,17:00:00,08:00:00,,",
+        "leslie,,,manhattan,,trinity prep,No,"
+        "1945-07-16,07:00:00,1945-07-16,09:00:00,02:00:00,,",
+    )
+
+    with sqlite_db() as conn:
+        n, *_ = conn.execute("SELECT COUNT(*) FROM activities").fetchone()
+
+    assert_exits(["import", "-t", "toggl", f])
+
+    with sqlite_db() as conn:
+        m, *_ = conn.execute("SELECT COUNT(*) FROM activities").fetchone()
+
+    assert m == n
+    assert capsys.readouterr() == ("", "qz: overlapping activities\n")
+
+
+def test_missing_file(capsys, stopped_db, tmp_path):
+    f = str(tmp_path / "nope.csv")
+    assert_exits(["import", "-t", "toggl", f])
+    assert capsys.readouterr() == ("", f"qz: no such file `{f}`\n")
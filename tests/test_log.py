@@ -0,0 +1,94 @@
+from qz import _SQL_LOG_SELECT, main, sqlite_db
+from tests import assert_exits
+
+
+def test_nothing_recorded(capsys, stopped_db):
+    main(["log"])
+
+    expected_stdout = "no recorded activities\n"
+    expected_stderr = ""
+    assert capsys.readouterr() == (expected_stdout, expected_stderr)
+
+
+def test_grouped_by_day(capsys, stopped_db):
+    with sqlite_db() as conn:
+        conn.execute(
+            "INSERT INTO activities VALUES (?, ?, ?, ?, ?)",
+            (
+                "0badc0de-0000-4000-8000-000000000000",
+                None,
+                None,
+                "1945-07-16 06:00:00.250000",
+                "1945-07-16 06:30:30.900000",
+            ),
+        )
+        rows = conn.execute(
+            "SELECT uuid FROM activities ORDER BY start_dt DESC"
+        ).fetchall()
+
+    main(["log", "--since", "1942-01-01"])
+
+    trinity, night_shift, robert, leslie = [u[:8] for u, in rows]
+    expected_lines = [
+        "\x1b[1m1945-07-16" + "9:29:30".rjust(78) + "\x1b[0m",
+        f"├ {'trinity test':49} │ manhattan │ 08:01-17:00 │ {trinity}",
+        f"└ {'∅':49} │ {'∅':9} │ 06:00-06:30 │ {night_shift}",
+        "",
+        "\x1b[1m1943-01-01" + "1:00:00".rjust(78) + "\x1b[0m",
+        f"└ {'talk with robert':49} │ manhattan │ 08:00-09:00 │ {robert}",
+        "",
+        "\x1b[1m1942-12-15" + "1:39:00".rjust(78) + "\x1b[0m",
+        f"└ {'call with leslie':49} │ manhattan │ 12:34-14:13 │ {leslie}",
+    ]
+
+    captured_out, captured_err = capsys.readouterr()
+    assert captured_out.splitlines() == expected_lines
+    assert captured_err == ""
+
+
+def test_non_canonical_timestamps(capsys, stopped_db):
+    # any format accepted by the schema's CHECKs can be inserted by hand
+    with sqlite_db() as conn:
+        conn.execute(
+            "INSERT INTO activities VALUES (?, ?, ?, ?, ?)",
+            (
+                "0badc0de-0000-4000-8000-000000000000",
+                None,
+                None,
+                "1944-06-06",
+                "1944-06-06T10:00",
+            ),
+        )
+
+    main(["log", "--since", "1944-01-01", "--until", "1945-01-01"])
+
+    expected_lines = [
+        "\x1b[1m1944-06-06" + "10:00:00".rjust(78) + "\x1b[0m",
+        f"└ {'∅':57} │ ∅ │ 00:00-10:00 │ 0badc0de",
+    ]
+
+    captured_out, captured_err = capsys.readouterr()
+    assert captured_out.splitlines() == expected_lines
+    assert captured_err == ""
+
+
+def test_bad_args(stopped_db):
+    bad_args = [
+        ["log", "--today", "--since", "10:00"],
+        ["log", "--since", "?!"],
+        ["log", "--until", "25:00"],
+    ]
+    for args in bad_args:
+        assert_exits(args)
+
+
+def test_query_plan(mock_env_db):
+    with sqlite_db() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN " + _SQL_LOG_SELECT, ("1942-01-01", "1946-01-01")
+        ).fetchall()
+
+    # the plan's wording isn't a stable interface, only check what matters
+    details = [d for *_, d in plan]
+    assert any("USING INDEX activities_start_stop" in d for d in details)
+    assert not any("SCAN" in d or "TEMP B-TREE" in d for d in details)
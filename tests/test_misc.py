@@ -1,37 +1,133 @@
+import sqlite3
+import uuid
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 
-from qz import get_db_path, main
+from qz import (
+    _SCHEMA_VERSION,
+    _connections,
+    _init_db,
+    _new_id,
+    _new_ids,
+    get_db_path,
+    main,
+    sqlite_db,
+)
+from tests import assert_exits
 
 
 @pytest.mark.parametrize(
     ("platform", "expected"),
     [
-        pytest.param("linux", "~/.local/share/qz/store.db", id="linux"),
-        pytest.param("win32", "~/AppData/Local/qz/store.db", id="win32"),
         pytest.param(
-            "darwin", "~/Library/Application Support/qz/store.db", id="darwin"
+            "linux", Path("~/.local/share/qz/store.db").expanduser(), id="linux"
+        ),
+        pytest.param(
+            "win32", Path("~/AppData/Local/qz/store.db").expanduser(), id="win32"
+        ),
+        pytest.param(
+            "darwin",
+            Path("~/Library/Application Support/qz/store.db").expanduser(),
+            id="darwin",
         ),
     ],
 )
-def test_default_db_path(platform, expected):
-    expected_path = Path(expected).expanduser()
+def test_default_db_path(monkeypatch, platform, expected):
+    monkeypatch.setattr("sys.platform", platform)
+    monkeypatch.delenv("QZ_DB", raising=False)
+    monkeypatch.delenv("XDG_DATA_HOME", raising=False)
+
+    assert get_db_path() == expected
+
 
-    with patch.dict("os.environ") as patched_env, patch("sys.platform", platform):
-        patched_env.pop("QZ_DB", None)
+def test_missing_data_dir(tmp_path):
+    db_path = tmp_path / "does" / "not" / "exist" / "store.db"
+    with patch.dict("os.environ", {"QZ_DB": str(db_path)}):
+        with sqlite_db() as conn:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
 
-        assert get_db_path() == expected_path
+    _connections.pop(db_path.resolve()).close()
+
+    assert db_path.is_file()
+    assert version == _SCHEMA_VERSION
+
+
+@pytest.mark.parametrize("immediate", [False, True])
+def test_immediate_transaction(mock_env_db, immediate):
+    with sqlite_db(immediate=immediate) as conn:
+        assert conn.in_transaction is immediate
+
+    assert not conn.in_transaction
 
 
 @pytest.mark.parametrize("args", [["lolitos"], ["@rabanadas!"]])
 def test_wrong_subcommand(capsys, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
-
-    assert exc_info.value.code == 1
+    assert_exits(args)
 
     expected_stdout = ""
     expected_stderr = f"qz: {args[0]!r} is not a qz command\n"
     assert capsys.readouterr() == (expected_stdout, expected_stderr)
+
+
+@pytest.mark.parametrize(
+    "new_id",
+    [_new_id, _new_ids(batch_size=16).__next__],
+    ids=["single", "batched"],
+)
+def test_new_id(new_id):
+    ids = {new_id() for _ in range(100)}
+
+    assert len(ids) == 100
+    for id_ in ids:
+        u = uuid.UUID(id_)
+        assert (str(u), u.version, u.variant) == (id_, 4, uuid.RFC_4122)
+
+
+def test_schema_upgrade(tmp_path):
+    conn = sqlite3.connect(tmp_path / "store.db")
+    conn.execute(
+        "CREATE TABLE activities (uuid TEXT PRIMARY KEY, message TEXT,"
+        " project TEXT, start_dt TEXT, stop_dt TEXT) WITHOUT ROWID, STRICT"
+    )
+
+    _init_db(conn)
+
+    version, *_ = conn.execute("PRAGMA user_version").fetchone()
+    names = {n for n, in conn.execute("SELECT name FROM sqlite_master")}
+    conn.close()
+
+    assert version == _SCHEMA_VERSION
+    assert {"activities_start_stop", "validate_dates_before_insert"} <= names
+
+
+def test_upgrade_with_overlapping(capsys, mock_env_db):
+    # older versions didn't check updates for overlaps, e.g. stopping an activity
+    # after adding another one within its running time
+    conn = sqlite3.connect(mock_env_db)
+    conn.executescript(
+        """\
+        CREATE TABLE activities (uuid TEXT PRIMARY KEY, message TEXT,
+          project TEXT, start_dt TEXT, stop_dt TEXT) WITHOUT ROWID, STRICT;
+        INSERT INTO activities VALUES
+          ('aaaa0000', 'work', NULL, '2022-07-30 10:00:00', '2022-07-30 12:00:00'),
+          ('bbbb0000', 'meeting', NULL, '2022-07-30 10:30:00', '2022-07-30 11:00:00');
+        """
+    )
+    conn.close()
+
+    assert_exits(["add", "2022-07-30 11:40", "2022-07-30 11:50"])
+    assert capsys.readouterr() == ("", "qz: overlapping activities\n")
+
+    main(["delete", "bbbb"])
+    main(["add", "2022-07-30 12:10", "2022-07-30 12:50"])
+    captured_out, captured_err = capsys.readouterr()
+
+    with sqlite_db() as conn:
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        (n,) = conn.execute("SELECT COUNT(*) FROM activities").fetchone()
+
+    assert captured_out.startswith("bbbb0000\n")
+    assert captured_err == ""
+    assert (version, n) == (_SCHEMA_VERSION, 2)
@@ -1,13 +1,8 @@
-import datetime
-import os
-from pathlib import Path
-from unittest.mock import patch
-
 import pytest
 
-from qz import __name__ as qz_module
 from qz import __version__ as qz_version
 from qz import main
+from tests import assert_exits
 
 
 @pytest.mark.parametrize(
@@ -19,10 +14,7 @@ from qz import main
     ],
 )
 def test_help_message(capsys, args):
-    with patch("sys.argv", ["qz"]), pytest.raises(SystemExit) as exc_info:
-        main(args)
-
-    assert exc_info.value.code == 0
+    assert_exits(args, code=0, prog="qz")
 
     captured_out, captured_err = capsys.readouterr()
     assert captured_out.startswith("usage: qz [-h] [-v] <command> ...")
@@ -37,10 +29,7 @@ def test_help_message(capsys, args):
     ],
 )
 def test_version_message(capsys, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
-
-    assert exc_info.value.code == 0
+    assert_exits(args, code=0)
 
     expected_stdout = f"qz version {qz_version}\n"
     expected_stderr = ""
@@ -55,14 +44,9 @@ def test_version_message(capsys, args):
     ],
 )
 def test_locate_message(capsys, mock_env_db, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
+    assert_exits(args, code=0)
 
-    assert exc_info.value.code == 0
-
-    db_path = Path(os.getenv("QZ_DB")).resolve()
-
-    expected_stdout = f"{db_path}\n"
+    expected_stdout = f"{mock_env_db}\n"
     expected_stderr = ""
     assert capsys.readouterr() == (expected_stdout, expected_stderr)
 
@@ -75,10 +59,8 @@ def test_nothing_running(capsys, stopped_db):
     assert capsys.readouterr() == (expected_stdout, expected_stderr)
 
 
-def test_something_running(capsys, running_db, frozen_now):
-    with patch(f"{qz_module}.datetime", wraps=datetime) as dt:
-        dt.datetime.now.return_value = frozen_now
-        main([])
+def test_something_running(capsys, running_db, frozen_datetime):
+    main([])
 
     expected_stdout = "tracking orbital simulations [artemis i] for 0:13:37\n"
     expected_stderr = ""
@@ -1,10 +1,7 @@
-import datetime
-from unittest.mock import patch
-
 import pytest
 
-from qz import __name__ as qz_module
-from qz import main, sqlite_db
+from qz import _new_id, main, sqlite_db
+from tests import assert_exits
 
 
 @pytest.mark.parametrize(
@@ -16,10 +13,8 @@ from qz import main, sqlite_db
         ["stop", "--at", "13:37"],
     ],
 )
-def test_good(capsys, running_db, frozen_now, args):
-    with patch(f"{qz_module}.datetime", wraps=datetime) as dt:
-        dt.date.today.return_value = frozen_now.date()
-        main(args)
+def test_good(capsys, running_db, frozen_datetime, args):
+    main(args)
 
     with sqlite_db() as conn:
         n, *_ = conn.execute("SELECT COUNT(*) FROM running_activity").fetchone()
@@ -42,65 +37,31 @@ def test_good(capsys, running_db, frozen_now, args):
     ],
 )
 def test_not_running(capsys, stopped_db, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
-
-    assert exc_info.value.code == 1
+    assert_exits(args)
 
     expected_stdout = ""
     expected_stderr = "qz: no running activity\n"
     assert capsys.readouterr() == (expected_stdout, expected_stderr)
 
 
-@pytest.mark.parametrize(
-    "args",
-    [
+def test_bad_args(running_db):
+    bad_args = [
+        # bad metadata
         ["stop", "--message"],
         ["stop", "-m", ""],
         ["stop", "--project", ""],
-    ],
-)
-def test_bad_metadata(running_db, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
-
-    assert exc_info.value.code == 1
-
-
-@pytest.mark.parametrize(
-    "args",
-    [
+        # bad datetimes
         ["stop", "--at", "##"],
         ["stop", "--at", "73:31"],
         ["stop", "--at", "+05:03"],
-    ],
-)
-def test_bad_datetime(running_db, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
-
-    assert exc_info.value.code == 1
-
-
-def test_future_datetime(running_db):
-    with pytest.raises(SystemExit) as exc_info:
-        main(["stop", "--at", "3022-07-30 08:00"])
-
-    assert exc_info.value.code == 1
-
-
-@pytest.mark.parametrize(
-    "args",
-    [
+        # future datetime
+        ["stop", "--at", "3022-07-30 08:00"],
+        # incompatible options
         ["stop", "--discard", "--at", "23:59"],
         ["stop", "-m", "kerbal gaming", "--discard"],
-    ],
-)
-def test_bad_option_combination(running_db, args):
-    with pytest.raises(SystemExit) as exc_info:
-        main(args)
-
-    assert exc_info.value.code == 1
+    ]
+    for args in bad_args:
+        assert_exits(args)
 
 
 def test_discard(capsys, running_db):
@@ -115,3 +76,17 @@ def test_discard(capsys, running_db):
 
     assert m == n - 1
     assert capsys.readouterr() == (id_ + "\n", "")
+
+
+def test_overlapping(capsys, running_db):
+    with sqlite_db() as conn:
+        conn.execute(
+            "INSERT INTO activities VALUES (?, ?, ?, ?, ?)",
+            (_new_id(), "coffee", None, "2022-07-30 08:50", "2022-07-30 08:55"),
+        )
+
+    assert_exits(["stop", "--at", "2022-07-30 08:58"])
+
+    expected_stdout = ""
+    expected_stderr = "qz: overlapping activities\n"
+    assert capsys.readouterr() == (expected_stdout, expected_stderr)